@@ -0,0 +1,153 @@
+import os, json, time, sqlite3, hashlib, logging
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'gyraffe')
+DEFAULT_MAX_SIZE = 256 * 1024**2  # bytes
+
+def content_key(data, version, settings):
+    """Hash profile bytes together with the gyraffe version and detection settings."""
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(str(version).encode())
+    hasher.update(json.dumps(settings, sort_keys=True).encode())
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    """Local cache of glitch parameters keyed by profile content.
+
+    Results are stored in an SQLite database under cache_dir, which is safe
+    to share between concurrent pool workers. Each process opens its own
+    connection on first use. When the stored results exceed max_size bytes,
+    the least recently used entries are evicted. Only the keys and values
+    are counted, so the database file (with its indexes and free pages) may
+    be several times larger.
+
+    Lookups are read-only. Access times of hits are kept in memory and
+    written with the next put, once flush_every hits are pending, or on
+    close. Call close when finished, otherwise recent hits do not count
+    towards the eviction order.
+    """
+    filename = 'results.sqlite'
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE, timeout=60.,
+                 flush_every=1000):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.timeout = timeout
+        self.flush_every = flush_every
+        self._conn = None
+        self._pid = None
+        self._accessed = {}
+
+    @property
+    def path(self):
+        return os.path.join(self.cache_dir, self.filename)
+
+    def __getstate__(self):
+        # Connections cannot be pickled or shared across processes
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_pid'] = None
+        state['_accessed'] = {}
+        return state
+
+    def _connect(self):
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        LOGGER.debug(f"Open result cache '{self.path}'")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, value TEXT, size INTEGER, accessed REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            # Running total of sizes, so eviction does not scan the results
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)')
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('total_size', 0)")
+        self._conn = conn
+        self._pid = os.getpid()
+        self._accessed = {}
+        return conn
+
+    def get(self, key):
+        """Returns (True, result) if key is cached, otherwise (False, None)."""
+        conn = self._connect()
+        row = conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            LOGGER.debug(f"Cache miss for key '{key}'")
+            return False, None
+        LOGGER.debug(f"Cache hit for key '{key}'")
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= self.flush_every:
+            self.flush()
+        return True, json.loads(row[0])
+
+    def put(self, key, result):
+        """Store a JSON-serialisable result (or None) under key."""
+        conn = self._connect()
+        value = json.dumps(result)
+        size = len(key) + len(value)
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._update_accessed(conn)
+            row = conn.execute('SELECT size FROM results WHERE key = ?', (key,)).fetchone()
+            old_size = 0 if row is None else row[0]
+            conn.execute(
+                'INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                (key, value, size, time.time())
+            )
+            self._add_size(conn, size - old_size)
+            self._evict(conn)
+
+    def flush(self):
+        """Write pending access times of cache hits."""
+        if not self._accessed:
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._update_accessed(conn)
+
+    def _update_accessed(self, conn):
+        conn.executemany('UPDATE results SET accessed = ? WHERE key = ?',
+                         [(accessed, key) for key, accessed in self._accessed.items()])
+        self._accessed = {}
+
+    def _add_size(self, conn, size):
+        conn.execute("UPDATE meta SET value = value + ? WHERE name = 'total_size'", (size,))
+
+    def _evict(self, conn):
+        total, = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()
+        if total <= self.max_size:
+            return
+        LOGGER.debug(f'Result cache size {total} exceeds {self.max_size} bytes, evicting')
+        keys, removed = [], 0
+        for key, size in conn.execute('SELECT key, size FROM results ORDER BY accessed'):
+            keys.append((key,))
+            removed += size
+            if total - removed <= self.max_size:
+                break
+        conn.executemany('DELETE FROM results WHERE key = ?', keys)
+        self._add_size(conn, -removed)
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM results')
+            conn.execute("UPDATE meta SET value = 0 WHERE name = 'total_size'")
+        self._accessed = {}
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self.flush()
+            self._conn.close()
+        self._conn = None
+        self._pid = None
+        self._accessed = {}
@@ -1,18 +1,32 @@
 import os, argparse, logging
+import io as _io
+import functools as _functools
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
 from multiprocessing import Pool
+from multiprocessing import util as _mp_util
 from ast import literal_eval
 from tqdm import tqdm
 
 from .io import read_mesa_profile
+from .cache import ResultCache, content_key, DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE
 
 # MAKE_PLOTS = False
 LOGGER = logging.getLogger(__name__)
 PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Settings which determine the glitch parameters, these form part of the cache key
+DETECTION_SETTINGS = {
+    'smooth_window': 25,
+    'he_T_min': 4e4,
+    'he_T_max': 2e5,
+    'gamma0': 1.651,
+}
+RESULT_COLUMNS = ['tau_he', 'delta_he', 'amp_he', 'tau_cz']
+
+@_functools.lru_cache(maxsize=None)
 def get_version():
     with open(os.path.join(PACKAGE_DIR, 'version.txt')) as file:
         version = literal_eval(file.readline())
@@ -98,11 +112,55 @@ def get_delta_cz(profile, tau, window_width=200.):
     delta = p2[0] - p1[0]
     return sound_speed, delta, 0.5 * sound_speed**2 * delta
 
-def find_glitch_params(filename, make_plots=False):
-    """Returns None if filename is not a valid mesa profile"""
+def read_bytes(filename):
+    """Read the raw bytes of a filename or open (text or binary) file."""
+    if isinstance(filename, str):
+        with open(filename, 'rb') as file:
+            return file.read()
+    with filename as file:
+        data = file.read()
+    if isinstance(data, str):
+        data = data.encode()
+    return data
+
+def find_glitch_params(filename, make_plots=False, cache=None):
+    """Returns None if filename is not a valid mesa profile.
+    
+    If a ResultCache is given, the profile bytes are hashed and the cache is
+    consulted before parsing. Duplicate or unchanged profiles are then not
+    re-analysed. The cache is not read when make_plots is True.
+    """
     LOGGER.debug(f"Find glitch parameters for file '{filename}'")
+    file = filename
+    if cache is not None:
+        try:
+            data = read_bytes(filename)
+        except Exception as err:
+            LOGGER.error(f"Unexpected exception of type '{type(err).__name__}' occurred while reading file '{filename}': {err}.")
+            return None
+        key = content_key(data, get_version(), DETECTION_SETTINGS)
+        if not make_plots:
+            found, result = cache.get(key)
+            if found:
+                return None if result is None else pd.Series({'filename': _basename(filename), **result})
+        file = _io.BytesIO(data)
+
+    output = _find_glitch_params(file, filename, make_plots=make_plots)
+
+    if cache is not None:
+        result = None if output is None else {col: float(output[col]) for col in RESULT_COLUMNS}
+        cache.put(key, result)
+    return output
+
+def _basename(filename):
+    if not isinstance(filename, str):
+        filename = filename.name
+    return os.path.basename(filename)
+
+def _find_glitch_params(file, filename, make_plots=False):
+    """Find glitch parameters from file, using filename for logging and output."""
     try:
-        profile = read_mesa_profile(filename)
+        profile = read_mesa_profile(file)
     except Exception as err:
         # TODO: this should raise a custom error to be caught later on optionally
         LOGGER.error(f"Unexpected exception of type '{type(err).__name__}' occurred while reading file '{filename}': {err}.")
@@ -110,10 +168,10 @@ def find_glitch_params(filename, make_plots=False):
 
     profile['c'] = sound_speed(profile)
     profile['tau'] = acoustic_depth(profile)
-    profile['gamma_smooth'] = smooth(profile['Gamma_1'], 25)
+    profile['gamma_smooth'] = smooth(profile['Gamma_1'], DETECTION_SETTINGS['smooth_window'])
     
     tau_he, delta_he, gamma_he, amp_he = (np.nan, np.nan, np.nan, np.nan)
-    he_cond = (profile['T'] > 4e4) & (profile['T'] < 2e5)
+    he_cond = (profile['T'] > DETECTION_SETTINGS['he_T_min']) & (profile['T'] < DETECTION_SETTINGS['he_T_max'])
 
     if any(he_cond):
         tau = profile.loc[he_cond, 'tau']
@@ -126,7 +184,7 @@ def find_glitch_params(filename, make_plots=False):
             tau_he = tau[mask].iloc[0]
             delta_he = tau_he - tau[mask].iloc[-1]
             gamma_he = profile[he_cond].loc[mask, 'Gamma_1'].iloc[0]
-            gamma0 = 1.651
+            gamma0 = DETECTION_SETTINGS['gamma0']
             Gamma_he = 2* delta_he * np.sqrt(2*np.pi) * (gamma0 - gamma_he) / (gamma0 + gamma_he)
             
             T = profile['tau'].iloc[0]
@@ -158,10 +216,8 @@ def find_glitch_params(filename, make_plots=False):
         plot_n2(axes[1], profile)
         # plt.show()
     
-    if not isinstance(filename, str):
-        filename = filename.name
     return pd.Series({
-        'filename': os.path.basename(filename),
+        'filename': _basename(filename),
         'tau_he': tau_he,
         'delta_he': delta_he,
         'amp_he': amp_he,
@@ -173,30 +229,45 @@ def find_glitch_params(filename, make_plots=False):
     })
 
 
-def findall_glitch_params(filenames, make_plots=False):
+def findall_glitch_params(filenames, make_plots=False, cache=None):
     outputs = []
     for filename in tqdm(filenames, desc='Finding glitch parameters', unit='files'):
-        output = find_glitch_params(filename, make_plots=make_plots)
+        output = find_glitch_params(filename, make_plots=make_plots, cache=cache)
         if output is not None:
             outputs.append(output)
     return pd.DataFrame(outputs)
 
 
-def pool_glitch_params(filenames, num_processes=1, chunksize_factor=4):
+_worker_cache = None
+
+def _init_worker(cache):
+    """Give each pool worker one cache, which is closed (and flushed) when the worker exits."""
+    global _worker_cache
+    _worker_cache = cache
+    if cache is not None:
+        _mp_util.Finalize(cache, cache.close, exitpriority=10)
+
+def _pool_find_glitch_params(filename):
+    return find_glitch_params(filename, cache=_worker_cache)
+
+def pool_glitch_params(filenames, num_processes=1, chunksize_factor=4, cache=None):
     
     chunksize, extra = divmod(len(filenames), num_processes * chunksize_factor)
     if extra:  # If leftover, add to chunksize
         chunksize += 1
     
     outputs = []
-    with Pool(num_processes) as pool:
+    with Pool(num_processes, initializer=_init_worker, initargs=(cache,)) as pool:
         # Create iterator map
         # TODO need way to make plots
-        imap = pool.imap_unordered(find_glitch_params, filenames, chunksize)
+        imap = pool.imap_unordered(_pool_find_glitch_params, filenames, chunksize)
         for output in imap:
             if output is not None:
                 outputs.append(output)
         # outputs = [output for output in imap]
+        # Let workers exit normally so their caches are flushed
+        pool.close()
+        pool.join()
     return pd.DataFrame(outputs)
 
 def main():
@@ -214,6 +285,13 @@ def main():
     parser.add_argument('--log-level', type=str, default='WARNING',
                         choices=['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG'],
                         )
+    parser.add_argument('--cache', action='store_true',
+                        help='cache results by profile content')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help=f'directory of the result cache (defaults to {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_SIZE / 1024**2,
+                        help='maximum size of the stored results in MB, the ' + \
+                             'cache file itself may be larger')
 
     args = parser.parse_args()
     
@@ -227,13 +305,23 @@ def main():
     
     root.setLevel(args.log_level)
     root.info(f'Using gyraffe v{get_version()}')
+
+    cache = None
+    if args.cache:
+        root.info(f"Using result cache in '{args.cache_dir}'")
+        cache = ResultCache(args.cache_dir, max_size=int(args.cache_size * 1024**2))
     
-    if args.num_processes == 1:
-        outputs = findall_glitch_params(args.filenames, make_plots=args.plot)
-        # outputs = [find_glitch_params(filename) for filename in \
-        #     tqdm(args.filenames, desc='Finding glitch parameters', unit='files')]
-    else:
-        outputs = pool_glitch_params(args.filenames, num_processes=args.num_processes)
+    try:
+        if args.num_processes == 1:
+            outputs = findall_glitch_params(args.filenames, make_plots=args.plot, cache=cache)
+            # outputs = [find_glitch_params(filename) for filename in \
+            #     tqdm(args.filenames, desc='Finding glitch parameters', unit='files')]
+        else:
+            outputs = pool_glitch_params(args.filenames, num_processes=args.num_processes,
+                                         cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
 
     if args.output is None:
         print('\nGlitch parameters:')
@@ -89,6 +89,7 @@ def read_mesa_profile(filename):
     # Read data from the file
 
     LOGGER.debug(f"Open file '{filename}'")
+    name = filename if isinstance(filename, str) else getattr(filename, 'name', filename)
     
     if isinstance(filename, str):
         filename = open(filename, 'r')
@@ -103,12 +104,12 @@ def read_mesa_profile(filename):
             version = int(header[-1])
         else:
             # Basic header validation
-            raise ValueError(f"Invalid header line in file '{filename:s}'")
+            raise ValueError(f"Invalid header line in file '{name}'")
         
         LOGGER.debug(f"Get column names for version {version:d}")
         names = COLUMN_NAMES.get(version, None)
         if names is None:
-            raise ValueError(f"Invalid header line in file '{filename:s}': {version:d}")
+            raise ValueError(f"Invalid header line in file '{name}': {version:d}")
         
         LOGGER.debug("Read table")
         profile = pd.read_table(file, delimiter='\s+', names=names)
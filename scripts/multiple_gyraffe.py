@@ -1,5 +1,6 @@
 import argparse, os, logging, zipfile, tqdm
-from gyraffe import find_glitch_params, get_version
+from gyraffe import find_glitch_params, get_version, ResultCache, \
+    DEFAULT_CACHE_DIR, DEFAULT_MAX_SIZE
 import pandas as pd
 
 def read_infile(infile):
@@ -7,12 +8,12 @@ def read_infile(infile):
         paths = f.read().splitlines()
     return paths
 
-def find_in_archive(archive, logger):
+def find_in_archive(archive, logger, cache=None):
     outputs = []
     for name in tqdm.tqdm(archive.namelist()):
         logger.debug(f"Finding glitch params for file '{name}'")
         with archive.open(name) as file:
-            output = find_glitch_params(file)
+            output = find_glitch_params(file, cache=cache)
         if output is not None:
             outputs.append(output)
     return outputs
@@ -32,6 +33,13 @@ def main():
                         help='name of profile archive under provided paths')
     parser.add_argument('--path', type=str, default='',
                         help='path to prepend to tracklist')
+    parser.add_argument('--cache', action='store_true',
+                        help='cache results by profile content')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help=f'directory of the result cache (defaults to {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_SIZE / 1024**2,
+                        help='maximum size of the stored results in MB, the ' + \
+                             'cache file itself may be larger')
 
     args = parser.parse_args()
     
@@ -44,25 +52,34 @@ def main():
     logger.setLevel(args.log_level)
     logger.info(f'Using gyraffe v{get_version()}')
 
+    cache = None
+    if args.cache:
+        logger.info(f"Using result cache in '{args.cache_dir}'")
+        cache = ResultCache(args.cache_dir, max_size=int(args.cache_size * 1024**2))
+
     paths = read_infile(args.infile)
 
-    for path in paths:
-        outfile = os.path.join(args.path, path, 'profile_gparams.csv')
-        archive_name = os.path.join(args.path, path, 'GYRE.zip')
-        logger.info(f"Running gyraffe for profiles in archive '{archive_name}'")
-        with zipfile.ZipFile(archive_name, 'r') as archive:
-            outputs = find_in_archive(archive, logger)
-        # try:
-        #     with zipfile.ZipFile(archive_name, 'r') as archive:
-        #         outputs = find_in_archive(archive)
-        # except Exception as err:
-        #     msg = f"Unexpected exception of type '{type(err).__name__}' occurred while " + \
-        #           f"finding glitch params in archive '{archive_name}': {err}"
-        #     logger.error(msg)
-        #     continue
+    try:
+        for path in paths:
+            outfile = os.path.join(args.path, path, 'profile_gparams.csv')
+            archive_name = os.path.join(args.path, path, 'GYRE.zip')
+            logger.info(f"Running gyraffe for profiles in archive '{archive_name}'")
+            with zipfile.ZipFile(archive_name, 'r') as archive:
+                outputs = find_in_archive(archive, logger, cache=cache)
+            # try:
+            #     with zipfile.ZipFile(archive_name, 'r') as archive:
+            #         outputs = find_in_archive(archive)
+            # except Exception as err:
+            #     msg = f"Unexpected exception of type '{type(err).__name__}' occurred while " + \
+            #           f"finding glitch params in archive '{archive_name}': {err}"
+            #     logger.error(msg)
+            #     continue
             
-        pd.DataFrame(outputs).to_csv(outfile, index=False)
-        logger.info(f"Results output to file '{outfile}'")
+            pd.DataFrame(outputs).to_csv(outfile, index=False)
+            logger.info(f"Results output to file '{outfile}'")
+    finally:
+        if cache is not None:
+            cache.close()
 
 if __name__ == "__main__":
     main()
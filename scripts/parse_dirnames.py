@@ -9,10 +9,20 @@ for a solar mass, solar metallicity star with helium abundance of 0.26.
 
 The values must be convertable to a Python int or float, but not including
 values with a leading period (e.g. '.98' would be interpreted as 98.0).
+
+Directories are listed with os.scandir and their modification times are
+read in parallel. The result can be saved as a compact columnar index
+(a NumPy .npz file with one array per column) which is updated
+incrementally on later runs and read by tracklist.py.
 """
-import os, re, argparse, unittest, sys
+import os, re, argparse, unittest, sys, logging, tempfile, zipfile
+import numpy as np
 import pandas as pd
 
+from concurrent.futures import ThreadPoolExecutor
+
+LOGGER = logging.getLogger(__name__)
+
 pattern = r'[+\-]?(?:0+|[1-9]\d*)\d*(?:\.\d+)?(?:[eE][+\-]?\d+)?'
 """Patten which finds numbers, modified from https://stackoverflow.com/a/658662
 
@@ -32,16 +42,102 @@ def explode(dirname):
     values = [to_number(s) for s in regex.findall(dirname)]
     return dict(zip(keys, values))
 
-def parse_dirnames(path):
-    records = []
-    dirnames = os.listdir(path)
-    for dirname in dirnames:
-        if dirname.startswith('.'):
+ROOT_MTIME_KEY = '__root_mtime__'
+RESERVED_KEYS = ('dirname', 'mtime', ROOT_MTIME_KEY)
+"""Names used by the scan and index, directories with these keys in their names are skipped."""
+
+def dir_mtime(entry):
+    """Returns the modification time of a directory entry, or None if not a directory."""
+    try:
+        if entry.is_dir():
+            return entry.stat().st_mtime
+    except OSError:
+        pass
+    return None
+
+def scan_dirnames(path, num_threads=8):
+    """Returns (dirnames, mtimes) of the non-hidden directories under path."""
+    with os.scandir(path) as it:
+        entries = [entry for entry in it if not entry.name.startswith('.')]
+    with ThreadPoolExecutor(num_threads) as executor:
+        mtimes = list(executor.map(dir_mtime, entries))
+    dirnames = [entry.name for entry, mtime in zip(entries, mtimes) if mtime is not None]
+    mtimes = [mtime for mtime in mtimes if mtime is not None]
+    return dirnames, mtimes
+
+def parse_dirnames(path, catalog=None, num_threads=8):
+    """Parse the directories under path, reusing metadata from an existing catalog.
+    
+    Every directory is stat-ed to record its mtime, but only directory names
+    not already in the catalog are exploded. Directories no longer present
+    are dropped.
+    """
+    dirnames, mtimes = scan_dirnames(path, num_threads=num_threads)
+    
+    known = pd.DataFrame({'dirname': []})
+    if catalog is not None:
+        known = catalog.drop(columns='mtime', errors='ignore')
+        known = known[known['dirname'].isin(dirnames)]
+    records, skipped = [], set()
+    for dirname in set(dirnames).difference(known['dirname']):
+        metadata = explode(dirname)
+        if any(key in RESERVED_KEYS for key in metadata):
+            LOGGER.warning(f"Skipping directory '{dirname}' with a key in {RESERVED_KEYS}")
+            skipped.add(dirname)
             continue
-        metadata = {'dirname': dirname}
-        metadata.update(explode(dirname))
-        records.append(metadata)
-    return pd.DataFrame.from_records(records)
+        records.append({'dirname': dirname, **metadata})
+    LOGGER.info(f'Found {len(dirnames)} directories, {len(records)} new')
+    
+    data = pd.DataFrame({'dirname': dirnames, 'mtime': mtimes})
+    data = data[~data['dirname'].isin(skipped)]
+    metadata = pd.concat([known, pd.DataFrame.from_records(records)],
+                         ignore_index=True)
+    return data.merge(metadata, on='dirname', how='left')
+
+def load_index(filename):
+    """Load a columnar index, returns (data, root_mtime)."""
+    with np.load(filename) as index:
+        root_mtime = float(index[ROOT_MTIME_KEY])
+        data = pd.DataFrame({key: index[key] for key in index.files if key != ROOT_MTIME_KEY})
+    return data, root_mtime
+
+def save_index(data, filename, root_mtime):
+    """Save data as a columnar index with one array per column."""
+    columns = {}
+    for key in data.columns:
+        values = data[key].to_numpy()
+        if key == 'dirname':
+            values = values.astype(str)
+        elif values.dtype == object:
+            values = values.astype(float)
+        columns[key] = values
+    columns[ROOT_MTIME_KEY] = np.array(root_mtime)
+    # Write to a temporary file then replace so readers never see a partial index.
+    # Members are written as in np.savez_compressed, which would reject a 'file' key.
+    dirname = os.path.dirname(os.path.abspath(filename))
+    with tempfile.NamedTemporaryFile(dir=dirname, suffix='.npz', delete=False) as file:
+        with zipfile.ZipFile(file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for key, values in columns.items():
+                with archive.open(f'{key}.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array(member, values, allow_pickle=False)
+    os.replace(file.name, filename)
+
+def update_index(path, filename, num_threads=8, force=False):
+    """Update the index at filename for the directories under path.
+    
+    If the mtime of path is unchanged since the index was written, no
+    directories have been added or removed and path is not listed again.
+    """
+    root_mtime = os.stat(path).st_mtime
+    catalog = None
+    if os.path.exists(filename):
+        catalog, index_root_mtime = load_index(filename)
+        if not force and index_root_mtime == root_mtime:
+            LOGGER.info(f"No changes to '{path}' since index was written")
+            return catalog
+    data = parse_dirnames(path, catalog=catalog, num_threads=num_threads)
+    save_index(data, filename, root_mtime)
+    return data
 
 
 class TestRegex(unittest.TestCase):
@@ -85,16 +181,85 @@ class TestRegex(unittest.TestCase):
         self.assertNotFullRegexpMatches('01d23')
 
 
+class TestIndex(unittest.TestCase):
+    """Tests that the index is updated incrementally."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'grid')
+        self.index = os.path.join(self.tmpdir.name, 'index.npz')
+        os.mkdir(self.path)
+        for dirname in ['m1.0FeH0.0Y0.26', 'm1.2FeH-0.1Y0.28', '.hidden']:
+            os.mkdir(os.path.join(self.path, dirname))
+        open(os.path.join(self.path, 'm0.8FeH0.0Y0.26'), 'w').close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_scan(self):
+        data = update_index(self.path, self.index)
+        self.assertCountEqual(data['dirname'], ['m1.0FeH0.0Y0.26', 'm1.2FeH-0.1Y0.28'])
+        data, _ = load_index(self.index)
+        row = data.set_index('dirname').loc['m1.2FeH-0.1Y0.28']
+        self.assertEqual(row['m'], 1.2)
+        self.assertEqual(row['FeH'], -0.1)
+        self.assertGreater(row['mtime'], 0.0)
+
+    def test_update(self):
+        update_index(self.path, self.index)
+        os.rmdir(os.path.join(self.path, 'm1.0FeH0.0Y0.26'))
+        os.mkdir(os.path.join(self.path, 'm1.0FeH0.0Y0.26dif1'))
+        data = update_index(self.path, self.index, force=True)
+        self.assertCountEqual(data['dirname'], ['m1.0FeH0.0Y0.26dif1', 'm1.2FeH-0.1Y0.28'])
+        self.assertEqual(data.set_index('dirname').loc['m1.0FeH0.0Y0.26dif1', 'dif'], 1)
+
+    def test_mtimes_updated(self):
+        update_index(self.path, self.index)
+        os.utime(os.path.join(self.path, 'm1.0FeH0.0Y0.26'), (5.0, 5.0))
+        os.mkdir(os.path.join(self.path, 'm1.4FeH0.0Y0.26'))
+        os.utime(self.path, (2.0, 2.0))  # ensure path has changed
+        data = update_index(self.path, self.index).set_index('dirname')
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data.loc['m1.0FeH0.0Y0.26', 'mtime'], 5.0)
+        data, _ = load_index(self.index)
+        self.assertEqual(data.set_index('dirname').loc['m1.0FeH0.0Y0.26', 'mtime'], 5.0)
+
+    def test_reserved_keys(self):
+        os.mkdir(os.path.join(self.path, 'mtime5m1.0'))
+        os.mkdir(os.path.join(self.path, 'm1.0dirname2'))
+        with self.assertLogs(__name__, level='WARNING'):
+            data = update_index(self.path, self.index)
+        self.assertCountEqual(data.columns, ['dirname', 'mtime', 'm', 'FeH', 'Y'])
+        self.assertEqual(len(data), 2)
+
+    def test_reserved_root_mtime(self):
+        os.mkdir(os.path.join(self.path, f'{ROOT_MTIME_KEY}1.0'))
+        with self.assertLogs(__name__, level='WARNING'):
+            update_index(self.path, self.index)
+        _, root_mtime = load_index(self.index)
+        self.assertEqual(root_mtime, os.stat(self.path).st_mtime)
+
+    def test_file_key(self):
+        os.mkdir(os.path.join(self.path, 'file1.0'))
+        update_index(self.path, self.index)
+        data, _ = load_index(self.index)
+        self.assertEqual(data.set_index('dirname').loc['file1.0', 'file'], 1.0)
+
+
 def run(args, _):
     if not os.path.isdir(args.path):
         raise FileNotFoundError(f'No such file or directory: {repr(args.path)}')
     
-    data = parse_dirnames(args.path)
-    
-    if args.output is None:
-        print(data)
+    if args.index is None:
+        data = parse_dirnames(args.path, num_threads=args.num_threads)
     else:
+        data = update_index(args.path, args.index, num_threads=args.num_threads,
+                            force=args.force)
+    
+    if args.output is not None:
         data.to_json(args.output)
+    elif args.index is None:
+        print(data)
 
 def test(_, unknown_args):
     # A bit of a hack to get the program name
@@ -108,6 +273,12 @@ def main():
     p = subparsers.add_parser('run', description='run script')
     p.add_argument('path', type=str, help='path to parse')
     p.add_argument('-o', '--output', type=str, help='filename to save JSON output')
+    p.add_argument('-i', '--index', type=str,
+                   help='filename of columnar (.npz) index to create or update')
+    p.add_argument('-n', '--num-threads', type=int, default=8,
+                   help='number of threads used to scan directories (defaults to 8)')
+    p.add_argument('-f', '--force', action='store_true',
+                   help='rescan even if path is unchanged since the index was written')
     p.set_defaults(func=run)
     
     p = subparsers.add_parser('test', description='run unit tests',
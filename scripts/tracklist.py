@@ -3,9 +3,27 @@ import argparse
 import numpy as np
 import pandas as pd
 
+COLS = {
+    'mass': 'm',
+    'metallicity': 'FeH',
+    'helium': 'Y',
+    'alpha': 'MLT',
+}
+
+def select_dirnames(data, args):
+    """Returns the dirnames in data matching every value given in args."""
+    dirnames = np.asarray(data['dirname'])
+    mask = np.ones(len(dirnames), dtype=bool)
+    for key, col in COLS.items():
+        if args[key] is None:
+            continue
+        mask &= np.isin(data[col], args[key])
+    return dirnames[mask].tolist()
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('infile', type=argparse.FileType('r'))
+    parser.add_argument('infile', type=str,
+                        help='columnar index (.npz) or JSON output of parse_dirnames.py')
     parser.add_argument('-o', '--outfile', type=argparse.FileType('w'))
     parser.add_argument('-m', '--mass', type=float, nargs='+')
     parser.add_argument('-f', '--metallicity', type=float, nargs='+')
@@ -14,30 +32,12 @@ def main():
     
     args = vars(parser.parse_args())
 
-    with args['infile'] as file:
-        data = pd.read_json(file)
-    
-    cols = {
-        'mass': 'm',
-        'metallicity': 'FeH',
-        'helium': 'Y',
-        'alpha': 'MLT',
-    }
-    
-    conditions = []
-    for key, col in cols.items():
-        if args[key] is None:
-            continue
-        conditions.append(data[col].isin(args[key]))
-
-    if len(conditions) > 0:
-        mask = conditions[0]
-        for cond in conditions[1:]:
-            mask = np.logical_and(mask, cond)
-            
-        dirnames = data.loc[mask, 'dirname'].to_list()
+    if args['infile'].endswith('.npz'):
+        # Columns are loaded lazily, so only those queried are read
+        with np.load(args['infile']) as data:
+            dirnames = select_dirnames(data, args)
     else:
-        dirnames = data['dirname'].to_list()
+        dirnames = select_dirnames(pd.read_json(args['infile']), args)
 
     if args['outfile'] is None:
         if len(dirnames) > 50:
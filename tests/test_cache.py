@@ -0,0 +1,170 @@
+import os, sqlite3, tempfile, unittest
+import numpy as np
+
+from gyraffe import find_glitch_params, pool_glitch_params, get_version, DETECTION_SETTINGS
+from gyraffe.cache import ResultCache, content_key
+
+def write_profile(filename, n=2000, r_cz=0.7):
+    """Write a synthetic version 19 profile which gyraffe can parse."""
+    x = np.linspace(0.0, 1.0, n)
+    columns = np.zeros((n, 19))
+    columns[:, 0] = np.arange(1, n + 1)  # k
+    columns[:, 1] = 7e10 * x  # r
+    columns[:, 4] = 2e17 * (1 - x)**2 + 1e5  # P
+    columns[:, 5] = 1.5e7 * (1 - x) + 5e3  # T
+    columns[:, 6] = 150 * (1 - x)**2 + 1e-7  # rho
+    columns[:, 8] = np.where(x < r_cz, 1e-6, -1e-6)  # N^2
+    columns[:, 9] = 5/3 - 0.1 * np.exp(-((x - 0.99) / 0.002)**2)  # Gamma_1
+    with open(filename, 'w') as file:
+        file.write(f'{n} 1.0 1.0 1.0 19\n')
+        np.savetxt(file, columns)
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmpdir.name, 'cache'))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def keys(self):
+        with sqlite3.connect(self.cache.path) as conn:
+            return {key for key, in conn.execute('SELECT key FROM results')}
+
+    def test_hit_and_miss(self):
+        self.assertEqual(self.cache.get('a'), (False, None))
+        self.cache.put('a', {'tau_he': 1.0, 'tau_cz': np.nan})
+        found, result = self.cache.get('a')
+        self.assertTrue(found)
+        self.assertEqual(result['tau_he'], 1.0)
+        self.assertTrue(np.isnan(result['tau_cz']))
+
+    def test_cached_none(self):
+        self.cache.put('a', None)
+        self.assertEqual(self.cache.get('a'), (True, None))
+
+    def test_key(self):
+        data = b'profile'
+        key = content_key(data, '0.0.1', {'gamma0': 1.651})
+        self.assertEqual(key, content_key(data, '0.0.1', {'gamma0': 1.651}))
+        self.assertNotEqual(key, content_key(b'profile2', '0.0.1', {'gamma0': 1.651}))
+        self.assertNotEqual(key, content_key(data, '0.0.2', {'gamma0': 1.651}))
+        self.assertNotEqual(key, content_key(data, '0.0.1', {'gamma0': 1.66}))
+
+    def test_eviction_order(self):
+        size = len('k0') + len('null')
+        cache = ResultCache(self.cache.cache_dir, max_size=3*size, flush_every=1)
+        for key in ['k0', 'k1', 'k2']:
+            cache.put(key, None)
+        cache.get('k0')  # k1 is now least recently used
+        cache.put('k3', None)
+        self.assertEqual(self.keys(), {'k0', 'k2', 'k3'})
+        cache.put('k4', None)
+        self.assertEqual(self.keys(), {'k0', 'k3', 'k4'})
+        cache.close()
+
+    def test_access_times_kept_on_close(self):
+        for key in ['k0', 'k1', 'k2']:
+            self.cache.put(key, None)
+        self.cache.get('k0')
+        self.cache.close()  # k1 is now least recently used
+        size = len('k0') + len('null')
+        cache = ResultCache(self.cache.cache_dir, max_size=3*size)
+        cache.put('k3', None)
+        self.assertEqual(self.keys(), {'k0', 'k2', 'k3'})
+        cache.close()
+
+    def test_get_is_read_only(self):
+        self.cache.put('a', None)
+        self.cache.get('a')
+        self.assertFalse(self.cache._conn.in_transaction)
+        self.assertIn('a', self.cache._accessed)
+        self.cache.flush()
+        self.assertEqual(self.cache._accessed, {})
+
+    def test_total_size(self):
+        cache = ResultCache(self.cache.cache_dir, max_size=100)
+        for i in range(20):
+            cache.put(f'k{i}', {'tau_he': float(i)})
+        cache.put('k19', None)  # replacing an entry updates the total
+        with sqlite3.connect(cache.path) as conn:
+            total, = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()
+            size, = conn.execute('SELECT SUM(size) FROM results').fetchone()
+        self.assertEqual(total, size)
+        self.assertLessEqual(total, 100)
+        cache.close()
+
+
+class TestFindGlitchParams(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmpdir.name, 'cache'))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def path(self, filename):
+        return os.path.join(self.tmpdir.name, filename)
+
+    def test_result_cached(self):
+        write_profile(self.path('a.GYRE'))
+        expected = find_glitch_params(self.path('a.GYRE'))
+        output = find_glitch_params(self.path('a.GYRE'), cache=self.cache)
+        self.assertTrue(expected.equals(output))
+        with open(self.path('a.GYRE'), 'rb') as file:
+            key = content_key(file.read(), get_version(), DETECTION_SETTINGS)
+        found, result = self.cache.get(key)
+        self.assertTrue(found)
+        self.assertEqual(result['tau_cz'], expected['tau_cz'])
+
+    def test_lookup_before_parsing(self):
+        data = b'not a profile'
+        with open(self.path('a.GYRE'), 'wb') as file:
+            file.write(data)
+        key = content_key(data, get_version(), DETECTION_SETTINGS)
+        self.cache.put(key, {'tau_he': 1.0, 'delta_he': 2.0, 'amp_he': 3.0, 'tau_cz': 4.0})
+        output = find_glitch_params(self.path('a.GYRE'), cache=self.cache)
+        self.assertEqual(output['filename'], 'a.GYRE')
+        self.assertEqual(output['tau_cz'], 4.0)
+
+    def test_unparsable_cached(self):
+        data = b'not a profile'
+        with open(self.path('a.GYRE'), 'wb') as file:
+            file.write(data)
+        with self.assertLogs('gyraffe', level='ERROR') as logs:
+            self.assertIsNone(find_glitch_params(self.path('a.GYRE'), cache=self.cache))
+        self.assertIn(f"reading file '{self.path('a.GYRE')}'", logs.output[0])
+        self.assertIn('Invalid header line', logs.output[0])
+        key = content_key(data, get_version(), DETECTION_SETTINGS)
+        self.assertEqual(self.cache.get(key), (True, None))
+
+    def accessed(self):
+        with sqlite3.connect(self.cache.path) as conn:
+            return dict(conn.execute('SELECT key, accessed FROM results'))
+
+    def test_pool(self):
+        filenames = [self.path(f'{i}.GYRE') for i in range(8)]
+        for i, filename in enumerate(filenames):
+            write_profile(filename, r_cz=0.6 + 0.02*i)
+        expected = pool_glitch_params(filenames, num_processes=2)
+        outputs = pool_glitch_params(filenames, num_processes=2, cache=self.cache)
+        self.assertEqual(outputs['tau_cz'].nunique(), len(filenames))
+        self.assertCountEqual(outputs['tau_cz'], expected['tau_cz'])
+        first = self.accessed()
+        self.assertEqual(len(first), len(filenames))
+        
+        # Second pass only hits, which are flushed when the workers exit
+        outputs = pool_glitch_params(filenames, num_processes=2, cache=self.cache)
+        self.assertCountEqual(outputs['tau_cz'], expected['tau_cz'])
+        second = self.accessed()
+        self.assertEqual(second.keys(), first.keys())
+        for key in first:
+            self.assertGreater(second[key], first[key])
+
+if __name__ == '__main__':
+    unittest.main()